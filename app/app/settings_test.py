@@ -0,0 +1,30 @@
+"""
+Django settings used when running the test suite.
+
+manage.py picks this module for the test command, so run the tests with:
+    python manage.py test --parallel
+"""
+from .settings import *  # noqa: F401,F403
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+
+# Test database
+# https://docs.djangoproject.com/en/3.2/ref/databases/#sqlite-notes
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {
+            'SERIALIZE': False,
+            'MIGRATE': False,
+        },
+    }
+}
@@ -1,30 +1,49 @@
+from django.conf import settings
 from django.test import TestCase, Client
-from django.contrib.auth import get_user_model
+from django.contrib.auth import (
+    get_user_model, SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+)
 from django.urls import reverse
 
+User = get_user_model()
+
+
+def fast_login(client, user):
+    """Log the user in by writing the auth keys straight into the session"""
+    session = client.session
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+
 
 class AdminSiteTests(TestCase):
 
-    def setUp(self):
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
             email='admin@admin.pl',
             password='test123'
         )
-        self.client.force_login(self.admin_user)
-        self.user = get_user_model().objects.create_user(
+        cls.user = User.objects.create_user(
             email='user@user.pl',
             password='test123',
             name='Test user name'
         )
 
+    def setUp(self):
+        self.client = Client()
+        fast_login(self.client, self.admin_user)
+
     def test_users_listed(self):
         """Test that users are listed on user page"""
         url = reverse('admin:core_user_changelist')
         resp = self.client.get(url)
 
-        self.assertContains(resp, self.user.name)
-        self.assertContains(resp, self.user.email)
+        self.assertEqual(resp.status_code, 200)
+        body = resp.content.decode(resp.charset)
+        self.assertIn(self.user.name, body)
+        self.assertIn(self.user.email, body)
 
     def test_user_change_page(self):
         """Test that the user edit page works"""